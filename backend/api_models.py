@@ -11,6 +11,10 @@ class IngestPayload(BaseModel):
     embedding: Optional[List[float]] = None
 
 
+class IngestBulkPayload(BaseModel):
+    items: List[IngestPayload]
+
+
 class SearchRequest(BaseModel):
     query: str
     top_k: int = Field(5, ge=1, le=50)
@@ -1,47 +1,309 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hmac
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from .config import (
+    API_TOKEN,
+    RATE_LIMIT_PER_MIN,
+    RATE_LIMIT_MAX_CLIENTS,
+    REDIS_URL,
+    REDIS_TIMEOUT_SEC,
+    REDIS_RETRY_AFTER_SEC,
+    INGEST_QUEUE_MAXSIZE,
+    INGEST_QUEUE_BATCH_SIZE,
+    INGEST_ENQUEUE_TIMEOUT_SEC,
+)
+from .api_models import IngestPayload, IngestBulkPayload, SearchRequest, DeletePayload
+from .vector_store import (
+    upsert_documents,
+    query_documents,
+    delete_documents,
+)
+
+logger = logging.getLogger(__name__)
+
+# Atomic token bucket shared by every API process. Uses the Redis server
+# clock so buckets stay consistent across hosts; idle keys expire after a
+# full refill window.
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call("TIME")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * capacity / window)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "ts", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(window))
+return allowed
+"""
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.rate_limit_script = None
+    redis_client = None
+    if REDIS_URL:
+        from redis import asyncio as aioredis
+
+        redis_client = aioredis.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            socket_timeout=REDIS_TIMEOUT_SEC,
+            socket_connect_timeout=REDIS_TIMEOUT_SEC,
+        )
+        app.state.rate_limit_script = redis_client.register_script(_TOKEN_BUCKET_LUA)
+
+    app.state.ingest_queue = asyncio.Queue(maxsize=INGEST_QUEUE_MAXSIZE)
+    drainer = asyncio.create_task(_ingest_drainer(app.state.ingest_queue))
+    try:
+        yield
+    finally:
+        # Apply everything already accepted with 202 before exiting.
+        await app.state.ingest_queue.join()
+        drainer.cancel()
+        if redis_client is not None:
+            await redis_client.aclose()
 
-from .api_models import IngestPayload, SearchRequest, DeletePayload
-from .vector_store import upsert_document, query_documents, delete_document
 
 app = FastAPI(
     title="Mongo → Chroma Vector API",
     version="1.0.0",
     description="Core vector service for syncing MongoDB documents into ChromaDB.",
+    lifespan=lifespan,
 )
 
 
-def build_text_from_payload(p: IngestPayload) -> str:
-    tags_str = ", ".join(p.tags) if p.tags else ""
-    return f"Title: {p.title}\nBody: {p.body}\nTags: {tags_str}".strip()
+# Encoded once so compare_digest never re-encodes per request. Auth is
+# skipped entirely when no token is configured (development only).
+API_TOKEN_BYTES = API_TOKEN.encode() if API_TOKEN else None
+_BEARER_PREFIX = "Bearer "
+_PUBLIC_PATHS = {"/health", "/docs", "/redoc", "/openapi.json"}
 
 
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
+def _is_authorized(request: Request) -> bool:
+    auth_header = request.headers.get("authorization", "")
+    if not auth_header.startswith(_BEARER_PREFIX):
+        return False
+    token = auth_header[len(_BEARER_PREFIX) :].strip().encode()
+    return hmac.compare_digest(token, API_TOKEN_BYTES)
 
 
-@app.post("/ingest")
-async def ingest_document(payload: IngestPayload):
-    text = build_text_from_payload(payload)
+# In-process fallback when REDIS_URL is unset.
+# Per-IP token buckets: ip -> (tokens, last_refill). O(1) per request and
+# LRU-capped, so idle clients are evicted instead of accumulating forever.
+_buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+_REFILL_PER_SEC = RATE_LIMIT_PER_MIN / 60
+# Circuit breaker: while Redis is failing, skip it until this monotonic
+# time so an outage doesn't add a timeout to every request.
+_redis_degraded = False
+_redis_retry_at = 0.0
+
 
+def _take_token(client_ip: str) -> bool:
+    now = time.monotonic()
+    tokens, last_refill = _buckets.get(client_ip, (RATE_LIMIT_PER_MIN, now))
+    tokens = min(RATE_LIMIT_PER_MIN, tokens + (now - last_refill) * _REFILL_PER_SEC)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+
+    _buckets[client_ip] = (tokens, now)
+    _buckets.move_to_end(client_ip)
+    if len(_buckets) > RATE_LIMIT_MAX_CLIENTS:
+        _buckets.popitem(last=False)
+    return allowed
+
+
+async def _allow_request(request: Request, client_ip: str) -> bool:
+    global _redis_degraded, _redis_retry_at
+
+    script = getattr(request.app.state, "rate_limit_script", None)
+    if script is None or (_redis_degraded and time.monotonic() < _redis_retry_at):
+        return _take_token(client_ip)
+    try:
+        allowed = await script(keys=[f"rl:{client_ip}"], args=[RATE_LIMIT_PER_MIN, 60])
+    except Exception as e:
+        # Redis unreachable: degrade to the per-process limit rather than
+        # failing every request, and don't try Redis again until the
+        # cool-down passes. Log the transition once, not per request.
+        _redis_retry_at = time.monotonic() + REDIS_RETRY_AFTER_SEC
+        if not _redis_degraded:
+            _redis_degraded = True
+            logger.warning("Redis rate limiter unavailable, using local limit: %s", e)
+        return _take_token(client_ip)
+    if _redis_degraded:
+        _redis_degraded = False
+        logger.info("Redis rate limiter recovered")
+    return bool(allowed)
+
+
+@app.middleware("http")
+async def auth_and_rate_limit(request: Request, call_next):
+    # Rate limit first so unauthenticated clients can't brute-force tokens.
+    client_ip = request.client.host if request.client else "unknown"
+    if not await _allow_request(request, client_ip):
+        return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
+
+    if (
+        API_TOKEN_BYTES is not None
+        and request.url.path not in _PUBLIC_PATHS
+        and not _is_authorized(request)
+    ):
+        return JSONResponse(
+            status_code=401,
+            content={"detail": "Invalid or missing bearer token"},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await call_next(request)
+
+
+def join_tags(p: IngestPayload) -> str | None:
     # Chroma metadata must be scalar-valued → convert list → string
-    tags_value = ", ".join(payload.tags) if payload.tags else None
+    return ", ".join(p.tags) if p.tags else None
+
+
+def build_text_from_payload(p: IngestPayload, tags_value: str | None) -> str:
+    return f"Title: {p.title}\nBody: {p.body}\nTags: {tags_value or ''}".strip()
 
+
+def build_metadata_from_payload(p: IngestPayload, tags_value: str | None) -> dict:
     metadata = {
         "source": "mongo",
-        "title": payload.title,
+        "title": p.title,
     }
     if tags_value is not None:
         metadata["tags"] = tags_value
+    return metadata
 
-    upsert_document(
-        doc_id=payload.mongo_id,
-        document=text,
-        metadata=metadata,
-        embedding=payload.embedding,  # optional
-    )
 
-    return {"status": "ingested", "id": payload.mongo_id}
+def _bulk_upsert(items: list[IngestPayload]) -> None:
+    """
+    Write `items` to Chroma with as few upserts as possible (one per
+    embedding mode; Chroma needs embeddings for all ids in a call or none).
+    Later items win on duplicate ids, which Chroma rejects within one call.
+    """
+    latest = {p.mongo_id: p for p in items}
+    with_embeddings = [p for p in latest.values() if p.embedding is not None]
+    without_embeddings = [p for p in latest.values() if p.embedding is None]
+
+    for group, embeddings in (
+        (with_embeddings, [p.embedding for p in with_embeddings]),
+        (without_embeddings, None),
+    ):
+        if not group:
+            continue
+        tags_values = [join_tags(p) for p in group]
+        upsert_documents(
+            doc_ids=[p.mongo_id for p in group],
+            documents=[
+                build_text_from_payload(p, tags)
+                for p, tags in zip(group, tags_values)
+            ],
+            metadatas=[
+                build_metadata_from_payload(p, tags)
+                for p, tags in zip(group, tags_values)
+            ],
+            embeddings=embeddings,
+        )
+
+
+def _apply_writes(items: list[IngestPayload | DeletePayload]) -> None:
+    """
+    Apply queued /ingest and /delete requests. Only the last request per id
+    matters, so an ingest followed by a delete of the same id (or the other
+    way round) resolves in arrival order.
+    """
+    latest = {item.mongo_id: item for item in items}
+    upserts = [p for p in latest.values() if isinstance(p, IngestPayload)]
+    deletes = [p.mongo_id for p in latest.values() if isinstance(p, DeletePayload)]
+    if upserts:
+        _bulk_upsert(upserts)
+    if deletes:
+        delete_documents(deletes)
+
+
+async def _ingest_drainer(queue: asyncio.Queue) -> None:
+    """
+    Background writer for /ingest and /delete: takes whatever is queued (up
+    to INGEST_QUEUE_BATCH_SIZE) and applies it in one batch off the event
+    loop. If the batch fails, items are retried one by one so a single bad
+    payload only loses itself.
+    """
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < INGEST_QUEUE_BATCH_SIZE and not queue.empty():
+            batch.append(queue.get_nowait())
+        try:
+            await asyncio.to_thread(_apply_writes, batch)
+        except Exception as e:
+            logger.warning(
+                "Failed to apply %d queued writes, retrying one by one: %s",
+                len(batch),
+                e,
+            )
+            for item in batch:
+                try:
+                    await asyncio.to_thread(_apply_writes, [item])
+                except Exception as item_error:
+                    logger.error(
+                        "Dropping queued %s for id=%s: %s",
+                        "ingest" if isinstance(item, IngestPayload) else "delete",
+                        item.mongo_id,
+                        item_error,
+                    )
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+async def _enqueue(item: IngestPayload | DeletePayload) -> None:
+    try:
+        await asyncio.wait_for(
+            app.state.ingest_queue.put(item), timeout=INGEST_ENQUEUE_TIMEOUT_SEC
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Ingest queue is full, retry later.")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/ingest", status_code=202)
+async def ingest_document(payload: IngestPayload):
+    """
+    Queue a document for indexing. Returns 202 once accepted; the Chroma
+    write happens in the background, batched with other queued documents.
+    """
+    await _enqueue(payload)
+    return {"status": "accepted", "id": payload.mongo_id}
+
+
+@app.post("/ingest_bulk")
+async def ingest_bulk(req: IngestBulkPayload):
+    """
+    Batch variant of /ingest: one HTTP call and one Chroma write for N docs.
+    Unlike /ingest this responds only after the write, so a 2xx means the
+    batch is stored (the worker checkpoints on it).
+    """
+    if req.items:
+        await asyncio.to_thread(_bulk_upsert, req.items)
+
+    return {"status": "ingested", "count": len(req.items)}
 
 
 @app.post("/search")
@@ -73,7 +335,11 @@ async def search(req: SearchRequest):
     return {"query": req.query, "results": results}
 
 
-@app.post("/delete")
+@app.post("/delete", status_code=202)
 async def delete(req: DeletePayload):
-    delete_document(req.mongo_id)
-    return {"status": "deleted", "id": req.mongo_id}
+    """
+    Queue a document for removal. Goes through the same queue as /ingest so
+    a delete is never overtaken by an earlier, still-queued ingest.
+    """
+    await _enqueue(req)
+    return {"status": "accepted", "id": req.mongo_id}
@@ -11,7 +11,7 @@ load_dotenv(BASE_ENV_PATH)
 APP_ENV = os.getenv("APP_ENV", "development")
 ENV_SPECIFIC = ROOT_DIR / f".env.{APP_ENV}"
 if ENV_SPECIFIC.exists():
-load_dotenv(ENV_SPECIFIC, override=True)
+    load_dotenv(ENV_SPECIFIC, override=True)
 
 # Fail fast if required vars are missing to avoid accidental defaults in production.
 REQUIRED_VARS = [
@@ -41,16 +41,52 @@ ALLOWED_CORS_ORIGINS = [
     if origin.strip()
 ]
 RATE_LIMIT_PER_MIN = int(os.getenv("RATE_LIMIT_PER_MIN", "120"))
+# Max client IPs tracked by the limiter; least recently seen are evicted.
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Optional: share rate-limit state across Uvicorn workers/replicas via Redis.
+REDIS_URL = os.getenv("REDIS_URL")
+# Keep short: the limiter runs on every request, and a stalled Redis should
+# fall back to the local limit quickly rather than hang the API.
+REDIS_TIMEOUT_SEC = float(os.getenv("REDIS_TIMEOUT_SEC", "0.5"))
+# After a Redis failure, use the local limit for this long before retrying.
+REDIS_RETRY_AFTER_SEC = float(os.getenv("REDIS_RETRY_AFTER_SEC", "5"))
 API_BASE = os.getenv("API_BASE", "http://localhost:8000")
 
+# /ingest write-behind queue: requests enqueue and return 202; a background
+# task writes to Chroma in batches. A full queue makes /ingest wait up to
+# the timeout, then answer 503.
+INGEST_QUEUE_MAXSIZE = int(os.getenv("INGEST_QUEUE_MAXSIZE", "10000"))
+INGEST_QUEUE_BATCH_SIZE = int(os.getenv("INGEST_QUEUE_BATCH_SIZE", "512"))
+INGEST_ENQUEUE_TIMEOUT_SEC = float(os.getenv("INGEST_ENQUEUE_TIMEOUT_SEC", "5"))
+
 # Worker settings
 POLL_INTERVAL_SEC = int(os.getenv("POLL_INTERVAL_SEC", "5"))
 WORKER_MAX_RETRIES = int(os.getenv("WORKER_MAX_RETRIES", "3"))
 WORKER_BACKOFF_BASE_SEC = float(os.getenv("WORKER_BACKOFF_BASE_SEC", "1.0"))
+# Upper bound on a single retry sleep (full jitter draws from [0, cap]).
+WORKER_BACKOFF_MAX_SEC = float(os.getenv("WORKER_BACKOFF_MAX_SEC", "15"))
+# Max /ingest_bulk calls in flight at once. Each call embeds and upserts a
+# whole batch server-side, so keep this small to avoid saturating the API.
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
 WORKER_CHECKPOINT_FILE = os.getenv(
     "WORKER_CHECKPOINT_FILE", str(ROOT_DIR / "worker_checkpoint.txt")
 )
+# Checkpoint group commit: flush at most every N ms or after N synced docs.
+WORKER_CHECKPOINT_FLUSH_INTERVAL_MS = int(
+    os.getenv("WORKER_CHECKPOINT_FLUSH_INTERVAL_MS", "1000")
+)
+WORKER_CHECKPOINT_FLUSH_EVERY_N = int(
+    os.getenv("WORKER_CHECKPOINT_FLUSH_EVERY_N", "1000")
+)
 USE_CHANGE_STREAM = os.getenv("USE_CHANGE_STREAM", "false").lower() == "true"
+# Tail a small capped "events" collection ({doc_id: <_id>} per change)
+# instead of opening a change stream; cheaper on busy clusters.
+USE_TAILABLE_CURSOR = os.getenv("USE_TAILABLE_CURSOR", "false").lower() == "true"
+INGEST_EVENTS_COLLECTION = os.getenv("INGEST_EVENTS_COLLECTION", "ingest_events")
+# Larger batches mean fewer getMore round-trips; a shorter await returns
+# partial batches sooner when the collection is quiet (lower latency).
+CHANGE_STREAM_BATCH_SIZE = int(os.getenv("CHANGE_STREAM_BATCH_SIZE", "1000"))
+CHANGE_STREAM_MAX_AWAIT_MS = int(os.getenv("CHANGE_STREAM_MAX_AWAIT_MS", "500"))
 WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9001"))
 
 # Mongo
@@ -75,4 +111,11 @@ GEMINI_EMBED_MODEL = os.getenv("GEMINI_EMBED_MODEL", "text-embedding-004")
 MAX_DOC_CHARS = int(os.getenv("MAX_DOC_CHARS", "12000"))
 
 # Worker batching
-WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "50"))
+# Docs per /ingest_bulk call; amortizes HTTP and Chroma write overhead.
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "500"))
+# Per-call /ingest_bulk timeout. Defaults to a fixed allowance plus ~0.1s per
+# doc, since the server embeds the whole batch before answering; a timeout
+# triggers a retry while the server keeps working, so err on the long side.
+WORKER_REQUEST_TIMEOUT_SEC = float(
+    os.getenv("WORKER_REQUEST_TIMEOUT_SEC", str(10 + WORKER_BATCH_SIZE / 10))
+)
@@ -18,30 +18,29 @@ collection = client.get_or_create_collection(
 )
 
 
-def upsert_document(
-    doc_id: str,
-    document: str,
-    metadata: Dict[str, Any],
-    embedding: List[float] | None = None,
+def upsert_documents(
+    doc_ids: List[str],
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    embeddings: List[List[float]] | None = None,
 ) -> None:
     """
-    Core upsert into Chroma.
-    If `embedding` is provided, we pass it.
-    If not, Chroma's collection will use its own embedding function.
+    Bulk upsert into Chroma: one vectorized write for the whole batch.
+    `embeddings`, when given, must line up with `doc_ids`.
     """
     kwargs: Dict[str, Any] = {
-        "ids": [doc_id],
-        "documents": [document],
-        "metadatas": [metadata],
+        "ids": doc_ids,
+        "documents": documents,
+        "metadatas": metadatas,
     }
-    if embedding is not None:
-        kwargs["embeddings"] = [embedding]
+    if embeddings is not None:
+        kwargs["embeddings"] = embeddings
 
     collection.upsert(**kwargs)
 
 
-def delete_document(doc_id: str) -> None:
-    collection.delete(ids=[doc_id])
+def delete_documents(doc_ids: List[str]) -> None:
+    collection.delete(ids=doc_ids)
 
 
 def query_documents(query: str, top_k: int = 5) -> Dict[str, Any]:
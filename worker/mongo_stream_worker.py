@@ -1,15 +1,271 @@
+import logging
+import os
+import queue
+import random
+import threading
 import time
-from datetime import datetime
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+import orjson
 import requests
-from pymongo import MongoClient
+from requests.adapters import HTTPAdapter
+from bson import decode_all, json_util
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
+from pymongo import CursorType, MongoClient
+from pymongo.errors import OperationFailure
 
-from backend.config import MONGO_URI, MONGO_DB, MONGO_COLLECTION
+from backend.config import (
+    API_BASE,
+    API_TOKEN,
+    MONGO_URI,
+    MONGO_DB,
+    MONGO_COLLECTION,
+    POLL_INTERVAL_SEC,
+    WORKER_MAX_RETRIES,
+    WORKER_BACKOFF_BASE_SEC,
+    WORKER_BACKOFF_MAX_SEC,
+    WORKER_CONCURRENCY,
+    WORKER_BATCH_SIZE,
+    WORKER_REQUEST_TIMEOUT_SEC,
+    WORKER_CHECKPOINT_FILE,
+    WORKER_CHECKPOINT_FLUSH_INTERVAL_MS,
+    WORKER_CHECKPOINT_FLUSH_EVERY_N,
+    USE_CHANGE_STREAM,
+    CHANGE_STREAM_BATCH_SIZE,
+    CHANGE_STREAM_MAX_AWAIT_MS,
+    USE_TAILABLE_CURSOR,
+    INGEST_EVENTS_COLLECTION,
+)
 
-API_BASE = "http://localhost:8000"
+logger = logging.getLogger(__name__)
 
-POLL_INTERVAL_SEC = 5
+# Mongo error code when a resume token has fallen off the oplog.
+_CHANGE_STREAM_HISTORY_LOST = 286
+
+# fdatasync skips the inode metadata flush; fall back where it is missing.
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+# One pooled session so TCP/TLS connections are reused across ingests. The
+# pool is sized to the thread pool so concurrent posts never discard
+# connections; retries are handled by _post_with_retry, not urllib3.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=1, pool_maxsize=WORKER_CONCURRENCY, max_retries=0
+)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Built once; the token is fixed for the life of the process. Bodies are
+# pre-serialized with orjson, so the content type is set explicitly.
+_HEADERS = {"Content-Type": "application/json"}
+if API_TOKEN:
+    _HEADERS["Authorization"] = f"Bearer {API_TOKEN}"
+
+
+def _empty_checkpoint():
+    # `oid`: last synced _id (polling); `resume_token`: last processed change
+    # stream event; `event_id`: last synced ingest_events entry (tailable
+    # cursor). Each mode advances its own field and preserves the others.
+    return {"oid": None, "resume_token": None, "event_id": None}
+
+
+def _load_checkpoint(path=WORKER_CHECKPOINT_FILE):
+    try:
+        with open(path, "rb") as f:
+            raw = f.read().decode().strip()
+    except FileNotFoundError:
+        return _empty_checkpoint()
+    if not raw:
+        return _empty_checkpoint()
+    try:
+        if raw.startswith("{"):
+            return {**_empty_checkpoint(), **json_util.loads(raw)}
+        # Older checkpoints hold a bare ObjectId.
+        return {**_empty_checkpoint(), "oid": ObjectId(raw)}
+    except (InvalidId, ValueError) as e:
+        logger.warning("Ignoring unreadable checkpoint in %s: %s", path, e)
+        return _empty_checkpoint()
+
+
+class _CheckpointWriter:
+    """
+    Group-commit checkpoint. `update()` only records the latest position in
+    memory; a background thread writes it in place and fdatasyncs once per
+    flush, every `flush_interval_ms` or after `flush_every_n` docs.
+
+    Records are space-padded to the longest one written so far, so in-place
+    rewrites never need a truncate.
+    """
+
+    def __init__(
+        self,
+        state=None,
+        path=WORKER_CHECKPOINT_FILE,
+        flush_interval_ms=WORKER_CHECKPOINT_FLUSH_INTERVAL_MS,
+        flush_every_n=WORKER_CHECKPOINT_FLUSH_EVERY_N,
+    ):
+        self.path = path
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_every_n = flush_every_n
+        self.pending = state or _empty_checkpoint()
+        self.flushed = self.pending
+        self.last_flush = time.monotonic()
+        self._unflushed = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+        self._width = os.fstat(self._fd).st_size
+        self._thread = threading.Thread(
+            target=self._run, name="checkpoint-writer", daemon=True
+        )
+        self._thread.start()
+
+    def update(self, count=1, **fields):
+        with self._lock:
+            self.pending = {**self.pending, **fields}
+            self._unflushed += count
+            if self._unflushed >= self.flush_every_n:
+                self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            pending = self.pending
+            self._unflushed = 0
+        if pending is self.flushed:
+            return
+        data = json_util.dumps(pending).encode()
+        self._width = max(self._width, len(data))
+        data = data.ljust(self._width)
+        if hasattr(os, "pwrite"):
+            os.pwrite(self._fd, data, 0)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            os.write(self._fd, data)
+        _fdatasync(self._fd)
+        self.flushed = pending
+        self.last_flush = time.monotonic()
+
+    def _run(self):
+        interval = self.flush_interval_ms / 1000
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error("Failed to write checkpoint %s: %s", self.path, e)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        try:
+            self.flush()
+        finally:
+            os.close(self._fd)
+
+
+# _post_with_retry outcomes. REJECTED means the payload itself is bad and
+# resending it can never succeed; FAILED means try again later.
+_SYNCED, _FAILED, _REJECTED = "synced", "failed", "rejected"
+
+# Statuses that blame the request body. Other 4xx (401/403/404, ...) point at
+# configuration, so they are FAILED, not grounds for dropping documents.
+_REJECT_STATUSES = {400, 413, 422}
+
+
+def _post_with_retry(url, payload) -> str:
+    """
+    POST `payload` to `url`. Connection errors, 429 and 5xx are retried with
+    capped exponential backoff and full jitter; other 4xx fail immediately.
+    Returns _SYNCED, _FAILED or _REJECTED.
+    """
+    try:
+        body = orjson.dumps(payload)
+    except orjson.JSONEncodeError as e:
+        logger.error("Cannot serialize request for %s: %s", url, e)
+        return _REJECTED
+
+    for attempt in range(WORKER_MAX_RETRIES + 1):
+        try:
+            r = _SESSION.post(
+                url, data=body, timeout=WORKER_REQUEST_TIMEOUT_SEC, headers=_HEADERS
+            )
+        except requests.RequestException as e:
+            error = e
+        else:
+            if r.ok:
+                return _SYNCED
+            if r.status_code != 429 and r.status_code < 500:
+                logger.error(
+                    "%s rejected request (%s): %s", url, r.status_code, r.text[:200]
+                )
+                return _REJECTED if r.status_code in _REJECT_STATUSES else _FAILED
+            error = f"HTTP {r.status_code}"
+
+        if attempt == WORKER_MAX_RETRIES:
+            logger.error(
+                "Failed to call %s after %d attempts: %s", url, attempt + 1, error
+            )
+            return _FAILED
+        cap = min(WORKER_BACKOFF_MAX_SEC, WORKER_BACKOFF_BASE_SEC * (2**attempt))
+        time.sleep(random.uniform(0, cap))
+    return _FAILED
+
+
+# Only the fields _build_payload reads; keeps wide documents off the wire.
+_SYNC_PROJECTION = {"_id": 1, "title": 1, "body": 1, "tags": 1}
+
+
+def _build_payload(doc):
+    return {
+        "mongo_id": str(doc["_id"]),
+        "title": doc.get("title", ""),
+        "body": doc.get("body", ""),
+        "tags": doc.get("tags", []),
+    }
+
+
+def _process_batch(docs) -> bool:
+    """
+    Send `docs` to /ingest_bulk in one call. Returns True once every doc is
+    either synced or skipped as permanently bad, False if the batch should
+    be retried later. A rejected batch is split in halves until the bad docs
+    are isolated, so one malformed doc never blocks the rest.
+    """
+    payload = {"items": [_build_payload(doc) for doc in docs]}
+    result = _post_with_retry(f"{API_BASE}/ingest_bulk", payload)
+    if result == _FAILED:
+        return False
+    if result == _REJECTED:
+        if len(docs) == 1:
+            logger.error("Skipping Mongo _id=%s: rejected by the API", docs[0]["_id"])
+            return True
+        mid = len(docs) // 2
+        return _process_batch(docs[:mid]) and _process_batch(docs[mid:])
+    # Lazy %-formatting: nothing is rendered unless the record is emitted.
+    logger.info(
+        "Synced %d Mongo docs (_id %s..%s) to Chroma",
+        len(docs),
+        docs[0]["_id"],
+        docs[-1]["_id"],
+    )
+    return True
+
+
+def _batched(items, size):
+    """Group any iterable (list or live cursor) into lists of `size`."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def run_polling_worker():
@@ -17,38 +273,389 @@ def run_polling_worker():
     db = client[MONGO_DB]
     coll = db[MONGO_COLLECTION]
 
-    print(f"Starting polling worker (every {POLL_INTERVAL_SEC}s)…")
+    logger.info(
+        "Starting polling worker (every %ss, batches of %d, %d concurrent ingests)…",
+        POLL_INTERVAL_SEC,
+        WORKER_BATCH_SIZE,
+        WORKER_CONCURRENCY,
+    )
+
+    # resume from the last persisted _id, if any
+    state = _load_checkpoint()
+    last_seen_id = state["oid"]
+    if last_seen_id is not None:
+        logger.info("Resuming after checkpoint _id=%s", last_seen_id)
+    checkpoint = _CheckpointWriter(state)
 
-    # track last seen _id
-    last_seen_id = None
+    try:
+        with ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY) as pool:
+            _poll_forever(coll, pool, checkpoint, last_seen_id)
+    finally:
+        checkpoint.close()
 
+
+def _poll_forever(coll, pool, checkpoint, last_seen_id):
     while True:
-        query = {}
-        if last_seen_id is not None:
-            query = {"_id": {"$gt": last_seen_id}}
+        last_seen_id = _poll_once(coll, pool, checkpoint, last_seen_id)
+        time.sleep(POLL_INTERVAL_SEC)
+
+
+class _Watermark:
+    """
+    High-watermark of contiguous successes for concurrently synced batches.
+    Batches are registered in ascending _id order and may finish in any
+    order; the checkpoint only advances past a batch once every earlier
+    batch has also succeeded, so a crash never loses a still-in-flight or
+    failed batch. Because registration order is already sorted, a deque
+    stands in for a sorted container. Only used from the polling thread.
+    """
+
+    def __init__(self, checkpoint, last_seen_id):
+        self.checkpoint = checkpoint
+        self.last_seen_id = last_seen_id
+        self.failed = False
+        self._inflight = deque()  # (last _id, doc count), ascending
+        self._completed = set()
+
+    def start(self, last_id, count):
+        self._inflight.append((last_id, count))
+
+    def finish(self, last_id, ok):
+        if not ok:
+            # Leave it at its place in _inflight: nothing after it can be
+            # checkpointed this pass.
+            self.failed = True
+            return
+        self._completed.add(last_id)
+        advanced = 0
+        while self._inflight and self._inflight[0][0] in self._completed:
+            self.last_seen_id, count = self._inflight.popleft()
+            self._completed.discard(self.last_seen_id)
+            advanced += count
+        if advanced:
+            self.checkpoint.update(oid=self.last_seen_id, count=advanced)
 
-        docs = list(coll.find(query).sort("_id", 1))
 
-        for doc in docs:
-            payload = {
-                "mongo_id": str(doc["_id"]),
-                "title": doc.get("title", ""),
-                "body": doc.get("body", ""),
-                "tags": doc.get("tags", []),
-            }
+def _settle(done, inflight, watermark):
+    """Record finished futures (removing them from `inflight`)."""
+    for future in done:
+        last_id = inflight.pop(future)
+        error = future.exception()
+        if error is not None:
+            logger.error(
+                "Syncing batch ending at _id=%s failed", last_id, exc_info=error
+            )
+        watermark.finish(last_id, error is None and future.result())
 
+
+def _poll_once(coll, pool, checkpoint, last_seen_id):
+    """Sync every doc after `last_seen_id`; returns the new checkpoint."""
+    query = {}
+    if last_seen_id is not None:
+        query = {"_id": {"$gt": last_seen_id}}
+
+    cursor = (
+        coll.find(query, projection=_SYNC_PROJECTION)
+        .sort("_id", 1)
+        .batch_size(WORKER_BATCH_SIZE)
+    )
+
+    # Stream the cursor instead of materializing the result set: at most
+    # WORKER_CONCURRENCY batches are held in memory/in flight at once. Stop
+    # submitting after the first failure; the rest is retried next pass.
+    # All watermark bookkeeping happens here, from the futures wait()
+    # returns, so the result is final once the last wait() does.
+    watermark = _Watermark(checkpoint, last_seen_id)
+    inflight = {}  # future -> last _id of its batch
+    with cursor:
+        for batch in _batched(cursor, WORKER_BATCH_SIZE):
+            if watermark.failed:
+                break
+            last_id = batch[-1]["_id"]
+            watermark.start(last_id, len(batch))
+            inflight[pool.submit(_process_batch, batch)] = last_id
+            if len(inflight) >= WORKER_CONCURRENCY:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                _settle(done, inflight, watermark)
+
+    done, _ = wait(inflight)
+    _settle(done, inflight, watermark)
+    return watermark.last_seen_id
+
+
+# Server-side filter + projection: only the fields _build_payload reads ever
+# leave the server, however wide the source documents are. The explicit
+# ns.db/ns.coll equality lets the server narrow its oplog scan early instead
+# of relying on the collection-level watch alone.
+_CHANGE_STREAM_PIPELINE = [
+    {
+        "$match": {
+            "ns.coll": MONGO_COLLECTION,
+            "ns.db": MONGO_DB,
+            "operationType": {"$in": ["insert", "replace", "update"]},
+        }
+    },
+    {
+        "$project": {
+            "_id": 1,
+            "operationType": 1,
+            "ns": 1,
+            "documentKey": 1,
+            "fullDocument._id": 1,
+            "fullDocument.title": 1,
+            "fullDocument.body": 1,
+            "fullDocument.tags": 1,
+        }
+    },
+]
+
+
+def _stream_reader(stream, events, stop):
+    """
+    Pull change events off `stream` and hand them to `events` in batches, so
+    the next getMore is already in flight while the main thread posts the
+    previous batch. A batch is emitted when full, once its oldest event has
+    waited max_await_time_ms, or when the server has nothing more; a steady
+    trickle of events therefore never sits unsynced for long. `events` is
+    bounded, so a slow consumer blocks the reader (backpressure).
+    """
+    max_age = CHANGE_STREAM_MAX_AWAIT_MS / 1000
+    try:
+        batch = []
+        batch_started = 0.0
+        while not stop.is_set() and stream.alive:
+            change = stream.try_next()
+            if change is not None:
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(change)
+                if (
+                    len(batch) < CHANGE_STREAM_BATCH_SIZE
+                    and time.monotonic() - batch_started < max_age
+                ):
+                    continue
+            if batch:
+                _put_until_stopped(events, batch, stop)
+                batch = []
+    except Exception as e:
+        _put_until_stopped(events, e, stop)
+        return
+    _put_until_stopped(events, None, stop)
+
+
+def _put_until_stopped(events, item, stop):
+    # Once the consumer has gone away nobody will drain the queue, so don't
+    # block the reader thread on it forever.
+    while not stop.is_set():
+        try:
+            events.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def _docs_from_changes(coll, changes):
+    """
+    Resolve change events to the docs to sync. Insert/replace events already
+    carry fullDocument; only update events need a lookup, done as one
+    projected $in query per batch rather than a server-side updateLookup
+    per event. Repeated changes to one doc collapse to its latest version
+    (Chroma rejects duplicate ids within a single upsert).
+    """
+    latest = {}
+    update_ids = []
+    for change in changes:
+        if change["operationType"] == "update":
+            update_ids.append(change["documentKey"]["_id"])
+        else:
+            doc = change["fullDocument"]
+            latest[doc["_id"]] = doc
+
+    if update_ids:
+        # Docs deleted since the update simply don't come back.
+        for doc in coll.find(
+            {"_id": {"$in": list(dict.fromkeys(update_ids))}},
+            projection=_SYNC_PROJECTION,
+        ):
+            latest[doc["_id"]] = doc
+    return list(latest.values())
+
+
+def run_change_stream_worker():
+    client = MongoClient(MONGO_URI)
+    db = client[MONGO_DB]
+    coll = db[MONGO_COLLECTION]
+
+    logger.info("Starting change stream worker…")
+
+    state = _load_checkpoint()
+    if state["resume_token"] is not None:
+        logger.info("Resuming change stream from saved resume token")
+    checkpoint = _CheckpointWriter(state)
+
+    try:
+        resume_token = state["resume_token"]
+        while True:
             try:
-                r = requests.post(f"{API_BASE}/ingest", json=payload, timeout=10)
-                r.raise_for_status()
-                print(
-                    f"[{datetime.utcnow().isoformat()}] Synced Mongo _id={payload['mongo_id']} to Chroma"
+                resume_token = _watch_changes(coll, checkpoint, resume_token)
+            except OperationFailure as e:
+                if e.code != _CHANGE_STREAM_HISTORY_LOST:
+                    raise
+                logger.error(
+                    "Saved resume token is no longer in the oplog; restarting "
+                    "from now. Run the polling worker once to backfill missed "
+                    "docs. (%s)",
+                    e,
                 )
-                last_seen_id = doc["_id"]
-            except Exception as e:
-                print(f"[ERROR] Failed to call /ingest: {e}")
+                resume_token = None
+            # A batch failed to sync or the stream closed: reopen from the
+            # last good token so nothing is skipped (at-least-once).
+            time.sleep(POLL_INTERVAL_SEC)
+    finally:
+        checkpoint.close()
 
-        time.sleep(POLL_INTERVAL_SEC)
+
+def _watch_changes(coll, checkpoint, resume_token):
+    """
+    Sync change events until a batch fails; returns the resume token of the
+    last fully synced batch.
+    """
+    events = queue.Queue(maxsize=2)
+    stop = threading.Event()
+
+    with coll.watch(
+        _CHANGE_STREAM_PIPELINE,
+        resume_after=resume_token,
+        batch_size=CHANGE_STREAM_BATCH_SIZE,
+        max_await_time_ms=CHANGE_STREAM_MAX_AWAIT_MS,
+    ) as stream:
+        reader = threading.Thread(
+            target=_stream_reader,
+            args=(stream, events, stop),
+            name="change-stream-reader",
+            daemon=True,
+        )
+        reader.start()
+        try:
+            while True:
+                changes = events.get()
+                if changes is None:
+                    return resume_token
+                if isinstance(changes, Exception):
+                    raise changes
+                docs = _docs_from_changes(coll, changes)
+                for batch in _batched(docs, WORKER_BATCH_SIZE):
+                    if not _process_batch(batch):
+                        return resume_token
+                resume_token = changes[-1]["_id"]
+                checkpoint.update(resume_token=resume_token, count=len(changes))
+        finally:
+            stop.set()
+
+
+def _sync_ids(coll, doc_ids) -> bool:
+    """Fetch the current version of `doc_ids` and send them in one batch."""
+    docs = list(coll.find({"_id": {"$in": doc_ids}}, projection=_SYNC_PROJECTION))
+    if not docs:
+        # All deleted since the event was written.
+        return True
+    return _process_batch(docs)
+
+
+def run_tailable_cursor_worker():
+    """
+    Follow a capped collection of `{"doc_id": <_id>}` events with a
+    tailable-await cursor and sync the referenced docs. Producers insert one
+    event per write; no replica set or oplog scan is needed.
+    """
+    client = MongoClient(MONGO_URI)
+    db = client[MONGO_DB]
+    coll = db[MONGO_COLLECTION]
+    events_coll = db[INGEST_EVENTS_COLLECTION]
+
+    logger.info(
+        "Starting tailable cursor worker on %s.%s…", MONGO_DB, INGEST_EVENTS_COLLECTION
+    )
+
+    state = _load_checkpoint()
+    last_event_id = state["event_id"]
+    if last_event_id is not None:
+        logger.info("Resuming after ingest event _id=%s", last_event_id)
+    checkpoint = _CheckpointWriter(state)
+
+    try:
+        while True:
+            last_event_id = _tail_events(coll, events_coll, checkpoint, last_event_id)
+            # The cursor died (collection missing/empty, or we fell off the
+            # end of the capped collection) or a batch failed to sync: reopen
+            # after the last synced event so nothing is skipped.
+            time.sleep(POLL_INTERVAL_SEC)
+    finally:
+        checkpoint.close()
+
+
+def _tail_events(coll, events_coll, checkpoint, last_event_id):
+    """
+    Sync events until the cursor dies or a batch fails; returns the _id of
+    the last fully synced event.
+    """
+    # Event _ids are client-generated ObjectIds, so with several producers
+    # their order doesn't match insertion order and a `$gt` filter could
+    # skip events. Instead, tail from the start in natural (insertion) order
+    # and skip everything up to and including the last synced event; the
+    # collection is small and capped, so the rescan is cheap.
+    skipping = last_event_id is not None
+    if skipping and events_coll.find_one({"_id": last_event_id}, {"_id": 1}) is None:
+        logger.warning(
+            "Ingest event _id=%s is no longer in %s; re-syncing every event in it",
+            last_event_id,
+            INGEST_EVENTS_COLLECTION,
+        )
+        skipping = False
+
+    # Raw batches yield exactly what each getMore returned, so events are
+    # synced as soon as they arrive instead of waiting for a full batch.
+    cursor = events_coll.find_raw_batches(
+        {},
+        projection={"doc_id": 1},
+        cursor_type=CursorType.TAILABLE_AWAIT,
+        batch_size=WORKER_BATCH_SIZE,
+    ).max_await_time_ms(CHANGE_STREAM_MAX_AWAIT_MS)
+
+    with cursor:
+        while cursor.alive:
+            for raw in cursor:
+                events = decode_all(raw)
+                if skipping:
+                    ids = [e["_id"] for e in events]
+                    if last_event_id not in ids:
+                        continue
+                    events = events[ids.index(last_event_id) + 1 :]
+                    skipping = False
+                if not events:
+                    continue
+                # De-duplicate repeated writes to the same doc.
+                doc_ids = list(dict.fromkeys(e["doc_id"] for e in events))
+                if not _sync_ids(coll, doc_ids):
+                    return last_event_id
+                last_event_id = events[-1]["_id"]
+                checkpoint.update(event_id=last_event_id, count=len(events))
+            if skipping:
+                # Caught up without seeing it: it was evicted mid-scan, so
+                # the events we skipped may be unsynced. Reopen and re-sync
+                # the whole collection rather than lose them.
+                logger.warning(
+                    "Ingest event _id=%s was evicted while resuming", last_event_id
+                )
+                return None
+    return last_event_id
 
 
 if __name__ == "__main__":
-    run_polling_worker()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if USE_TAILABLE_CURSOR:
+        run_tailable_cursor_worker()
+    elif USE_CHANGE_STREAM:
+        run_change_stream_worker()
+    else:
+        run_polling_worker()